@@ -3,10 +3,13 @@
 """
 
 
-from dna import DNA
+from dna import DNA, DNAException
 from dna_chain import DNANode, DNACrawlerException
+from dna_columns import DNAColumn
 
 
 __globals__ = ('DNA',
+               'DNAException',
                'DNANode',
-               'DNACrawlerException')
+               'DNACrawlerException',
+               'DNAColumn')
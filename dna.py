@@ -3,10 +3,96 @@
 """
 
 
+import weakref
+from bisect import bisect_left
+from functools import reduce
+from multiprocessing import Pool, cpu_count
+from operator import attrgetter
+
 from dna_chain import DNACrawler, DNANode
+from dna_columns import DNAColumns
+
+
+__globals__ = ('DNA',
+               'DNAException')
+
+
+# Default for arguments where None is a meaningful value.
+_missing = object()
+
+
+class DNAException(Exception):
+    pass
+
+
+def _walk(head):
+    """
+    Traverse the chain starting at head in pre-order, yielding a tuple of
+    (node, parent, index) for each node.  parent is the node whose child chain
+    the node belongs to (None at the top level) and index is the node's
+    position within that chain.
+    """
 
+    stack = []
+    node, parent, index = head, None, 0
+    while node is not None or stack:
+        if node is None:
+            node, parent, index = stack.pop()
+            continue
+
+        yield node, parent, index
+
+        if node.dna_node_child is not None:
+            stack.append((node.dna_node_next_sib, parent, index + 1))
+            node, parent, index = node.dna_node_child, node, 0
+        else:
+            node, index = node.dna_node_next_sib, index + 1
+
+
+def _subtree(node):
+    """
+    Yield node and then all its descendants in pre-order.
+    """
+    yield node
+    for n, _, _ in _walk(node.dna_node_child):
+        yield n
+
+
+def _longest_increasing(seq):
+    """
+    Return the set of positions in seq that form a longest strictly
+    increasing subsequence.  O(n log n).
+    """
 
-__globals__ = ('DNA', )
+    tails = []      # smallest tail value of an increasing run of each length
+    tail_pos = []   # position in seq of each of those tails
+    prev = [None] * len(seq)
+
+    for pos, value in enumerate(seq):
+        i = bisect_left(tails, value)
+        if i == len(tails):
+            tails.append(value)
+            tail_pos.append(pos)
+        else:
+            tails[i] = value
+            tail_pos[i] = pos
+        prev[pos] = tail_pos[i - 1] if i else None
+
+    keep = set()
+    pos = tail_pos[-1] if tail_pos else None
+    while pos is not None:
+        keep.add(pos)
+        pos = prev[pos]
+
+    return keep
+
+
+def _map_reduce_chunk(args):
+    """
+    Worker side of DNA.map_reduce.
+    """
+    fn, reducer, nodes = args
+    return reduce(reducer, [fn(node) for node in nodes])
 
 
 class DNA(object):
@@ -27,22 +113,76 @@ class DNA(object):
 
         DNA node: context is node ( n )
             + add attribute
-                ( n + NAME OBJECT)
+                ( n + NODE NAME OBJECT)
             - delete attribute
-                ( n - NAME )
+                ( n - NODE NAME )
             ^ change attribute
-                ( n ^ NAME OBJECT )
+                ( n ^ NODE NAME OBJECT )
+
+    Every node gets an integer id when it is added to the chain, see
+    register.  With event_ids=True the linked RNAs receive events with the
+    nodes replaced by their ids (see encode_event).
+
+    With columns (a dict of attribute name -> NumPy dtype) those node
+    attributes are kept in arrays owned by the DNA, see dna_columns.
     """
 
+    # (op, placement) -> DNACrawler method used to replay a chain event
+    _chain_ops = {
+        ('+', 'b'): 'add_before',
+        ('+', 'a'): 'add_after',
+        ('+', 'c'): 'add_child',
+        ('^', 'b'): 'move_before',
+        ('^', 'a'): 'move_after',
+        ('^', 'c'): 'move_child',
+    }
+
     def __init__(self, **kwargs):
-        self.head = None
+        self.__nodes = weakref.WeakValueDictionary()
+        self.__next_id = 1
+        self.__head = None
+
+        columns = kwargs.get('columns')
+        self.columns = DNAColumns(columns) if columns else None
         self.node_factory = kwargs.get('node_factory', DNANode)
+        self.node_key = kwargs.get('node_key', attrgetter('key'))
+        self.event_ids = kwargs.get('event_ids', False)
 
         self.__rnas = []
+        self.__unlinked = []    # weakrefs to RNAs that have been unlinked
+
+    @property
+    def head(self):
+        return self.__head
+
+    @head.setter
+    def head(self, node):
+        """
+        Replace the chain with the one starting at node.
+        """
+        columns = self.columns
+        if columns is not None and self.__head is not None:
+            columns.set_linked(
+                [n._dna_node_slot for n, _, _ in _walk(self.__head)], False)
+
+        self.__head = node
+        if node is not None:
+            self.register_subtree(node, True)
+            if columns is not None:
+                columns.set_linked(
+                    [n._dna_node_slot for n, _, _ in _walk(node)], True)
+
+    def _move_head(self, node):
+        """
+        Point head at another node of the same chain.  Used by DNACrawler when
+        editing the chain moves the head, the nodes in the chain don't change.
+        """
+        self.__head = node
 
     def link(self, rna, update=True):
         if rna not in self.__rnas:
             self.__rnas.append(rna)
+            self.__unlinked = [r for r in self.__unlinked if r() is not rna]
             if update:
                 # TODO: update RNA
                 pass
@@ -50,8 +190,301 @@ class DNA(object):
     def unlink(self, rna):
         if rna in self.__rnas:
             self.__rnas.remove(rna)
+            try:
+                self.__unlinked.append(weakref.ref(rna))
+            except TypeError:
+                # Can't track objects that don't support weak references.
+                pass
+
+    def unlinked_rnas(self):
+        """
+        Return the RNAs that have been unlinked but are still alive.
+        """
+        self.__unlinked = [r for r in self.__unlinked if r() is not None]
+        return [r() for r in self.__unlinked]
+
+    def emit(self, event):
+        """
+        Pass an event on to all the linked RNAs.
+        """
+        if self.columns is not None and event[0] == 'c' and event[1] != '^':
+            self.columns.set_linked(
+                [n._dna_node_slot for n in _subtree(event[2])],
+                event[1] == '+')
+
+        if self.event_ids:
+            event = self.encode_event(event)
+        for rna in self.__rnas:
+            rna.on_dna_event(event)
 
     def spawn_crawler(self):
         c = DNACrawler(self)
         c.attach_to(self.head)
         return c
+
+    def map_reduce(self, fn, reducer, initial=_missing, workers=None,
+                   chunk_size=None):
+        """
+        Apply fn to every node and combine the results with reducer, in crawl
+        order, starting from initial (if given).  Returns initial, or None,
+        for an empty chain.
+
+        The chain is split into contiguous runs of crawl order of chunk_size
+        nodes (by default enough for four chunks per worker).  Each run is
+        shipped to a pool of worker processes as detached copies of its
+        nodes, so fn must not rely on the chain links.  Each worker reduces
+        its own run, so reducer must be associative.  fn and reducer must be
+        picklable (e.g. module-level functions).
+
+        With workers=1 everything runs in this process and fn is given the
+        live nodes.  Otherwise fn only sees copies: changes it makes to them
+        are lost, so return what needs to change and apply it here.
+        """
+
+        workers = cpu_count() if workers is None else workers
+        nodes = list(self.spawn_crawler().crawl())
+
+        if not nodes:
+            return None if initial is _missing else initial
+
+        if workers == 1:
+            results = [_map_reduce_chunk((fn, reducer, nodes))]
+        else:
+            if chunk_size is None:
+                chunk_size = -(-len(nodes) // (workers * 4))
+            chunks = [(fn, reducer,
+                       [n.dna_node_copy() for n in nodes[i:i + chunk_size]])
+                      for i in range(0, len(nodes), chunk_size)]
+
+            pool = Pool(workers)
+            try:
+                results = pool.map(_map_reduce_chunk, chunks)
+            finally:
+                pool.close()
+                pool.join()
+
+        if initial is _missing:
+            return reduce(reducer, results)
+        return reduce(reducer, results, initial)
+
+    # - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ -
+    # node ids
+    # - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ -
+
+    def node(self, node_id):
+        """
+        Return the node with the given id.  Raises KeyError if there is no
+        such node (or it has been garbage collected).
+        """
+        return self.__nodes[node_id]
+
+    def registered_nodes(self):
+        """
+        Return all the nodes that have an id in this DNA and are still alive,
+        whether or not they are in the chain.
+        """
+        return list(self.__nodes.values())
+
+    def register(self, node, node_id=None):
+        """
+        Return node's id, first giving it one (node_id, if specified) unless it
+        already has one in this DNA.  The registry only holds weak references,
+        nodes that are no longer in use drop out of it.
+        """
+        nodes = self.__nodes
+        if node_id is None:
+            node_id = node._dna_node_id
+            if node_id is not None and nodes.get(node_id) is node:
+                return node_id
+            node_id = self.__next_id
+
+        self.__next_id = max(self.__next_id, node_id + 1)
+        node._dna_node_id = node_id
+        nodes[node_id] = node
+        if self.columns is not None:
+            self.columns.attach(node)
+        return node_id
+
+    def register_subtree(self, node, sibs=False):
+        """
+        Register node and all its descendants (and the siblings coming after
+        it, with theirs, if sibs is true).  Does nothing if node is already
+        registered, its descendants are assumed to be as well.
+        """
+        if self.__nodes.get(node._dna_node_id) is node:
+            return
+
+        if sibs:
+            nodes = (n for n, _, _ in _walk(node))
+        else:
+            nodes = _subtree(node)
+
+        for n in nodes:
+            self.register(n)
+
+    def column(self, name, node=None):
+        """
+        Return a NumPy array of the values of column name for every node in
+        the chain (in no particular order), or for node and its descendants
+        (in crawl order).
+        """
+        if self.columns is None:
+            raise DNAException("DNA has no columns.")
+
+        if node is None:
+            return self.columns.column(name)
+        return self.columns.column(
+            name, [n._dna_node_slot for n in _subtree(node)])
+
+    def encode_event(self, event):
+        """
+        Return event with the nodes replaced by their ids.
+        """
+        if event[0] == 'c' and len(event) == 5:
+            ref = event[4]
+            return event[:2] + (event[2]._dna_node_id, event[3],
+                                None if ref is None else ref._dna_node_id)
+        return event[:2] + (event[2]._dna_node_id, ) + event[3:]
+
+    def decode_event(self, event):
+        """
+        The reverse of encode_event.
+        """
+        nodes = self.__nodes
+        if event[0] == 'c' and len(event) == 5:
+            ref = event[4]
+            return event[:2] + (nodes[event[2]], event[3],
+                                None if ref is None else nodes[ref])
+        return event[:2] + (nodes[event[2]], ) + event[3:]
+
+    # - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ -
+    # diffing
+    # - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ -
+
+    def diff(self, other, key=None):
+        """
+        Compute the events that turn this chain into other's chain.
+
+        Nodes are matched between the chains by key (node_key if key is not
+        specified).  Matched nodes keep their identity; they are only moved
+        when their parent changes or they fall out of the longest run of
+        siblings already in the right order, and get node events for any
+        attributes that differ.  Unmatched nodes in other are added as
+        detached copies, unmatched nodes here are removed.  Runs in
+        O(n log n).
+
+        If this chain is empty the first node of other's chain is added with
+        ( c + NODE b None ), i.e. as the head.
+
+        The events are meant to be replayed, in order, with apply_diff.
+        """
+
+        key = self.node_key if key is None else key
+
+        old = {}
+        for node, parent, index in _walk(self.head):
+            k = key(node)
+            if k in old:
+                raise DNAException("Duplicate node key {!r}.".format(k))
+            old[k] = (node, parent, index)
+
+        order = []
+        chains = {}
+        new_keys = set()
+        for node, parent, index in _walk(other.head):
+            k = key(node)
+            if k in new_keys:
+                raise DNAException("Duplicate node key {!r}.".format(k))
+            new_keys.add(k)
+            order.append((node, parent, index))
+            chains.setdefault(parent, []).append(node)
+
+        events = []
+        placed = {}  # node in other -> node here
+        stay = set()
+
+        for t_node, t_parent, index in order:
+            if index == 0:
+                # First time we see this chain, work out which of its nodes
+                # can stay where they are.
+                parent = placed.get(t_parent)
+                candidates = []
+                for sib in chains[t_parent]:
+                    entry = old.get(key(sib))
+                    if entry is not None and entry[1] is parent:
+                        candidates.append((entry[2], sib))
+                keep = _longest_increasing([i for i, _ in candidates])
+                stay.update(candidates[i][1] for i in keep)
+
+            entry = old.get(key(t_node))
+            if entry is None:
+                node = t_node.dna_node_copy()
+                op = '+'
+            else:
+                node = entry[0]
+                op = None if t_node in stay else '^'
+            placed[t_node] = node
+
+            if op is not None:
+                if index:
+                    where, ref = 'a', placed[t_node.dna_node_prev_sib]
+                elif t_parent is not None:
+                    where, ref = 'c', placed[t_parent]
+                else:
+                    where, ref = 'b', self.head
+                events.append(('c', op, node, where, ref))
+
+            if entry is not None:
+                events.extend(self.__diff_attrs(node, t_node))
+
+        removed = set()
+        for node, parent, index in _walk(self.head):
+            if key(node) not in new_keys:
+                removed.add(node)
+                # Removing a node takes its (remaining) subtree with it.
+                if parent not in removed:
+                    events.append(('c', '-', node))
+
+        return events
+
+    @staticmethod
+    def __diff_attrs(node, target):
+        have = node.dna_node_attrs()
+        want = target.dna_node_attrs()
+        events = []
+
+        for name in sorted(want):
+            if name not in have:
+                events.append(('n', '+', node, name, want[name]))
+            elif have[name] != want[name]:
+                events.append(('n', '^', node, name, want[name]))
+
+        for name in sorted(have):
+            if name not in want:
+                events.append(('n', '-', node, name))
+
+        return events
+
+    def apply_diff(self, events):
+        """
+        Replay events (as produced by diff) against this chain.
+        """
+
+        crawler = self.spawn_crawler()
+
+        for event in events:
+            context, op, node = event[:3]
+            if context == 'c':
+                if op == '-':
+                    crawler.remove(node)
+                elif event[4] is None:
+                    # Adding to an empty chain, node becomes the head.
+                    self.head = node
+                    self.emit(event)
+                else:
+                    where, ref = event[3:]
+                    getattr(crawler, self._chain_ops[op, where])(node, ref)
+            elif op == '-':
+                crawler.del_attr(event[3], node)
+            else:
+                crawler.set_attr(event[3], event[4], node)
@@ -39,6 +39,7 @@ chain.  The first child in a chain has a link back to its parent.
 """
 
 
+import copy
 from collections import deque
 
 
@@ -47,6 +48,20 @@ __globals__ = ('DNANode',
                'DNACrawler')
 
 
+# Attribute values of these types are shared rather than deep-copied when
+# cloning.
+_IMMUTABLE = frozenset((type(None), bool, int, float, complex, str, bytes,
+                        frozenset, type(u'')))
+try:
+    _IMMUTABLE |= frozenset((long, ))    # Python 2
+except NameError:
+    pass
+
+# Set in a deepcopy memo to have nodes that aren't already in it shared rather
+# than copied.
+_SHARE_NODES = object()
+
+
 class DNANode(object):
     """
     The base unit of our DNA data structure.
@@ -57,6 +72,16 @@ class DNANode(object):
         self._dna_node_parent = None
         self._dna_node_next_sib = None
         self._dna_node_prev_sib = None
+        self._dna_node_id = None
+        self._dna_node_slot = None
+        self._dna_node_columns = None
+
+    @property
+    def dna_node_id(self):
+        """
+        The node's id within the DNA it was added to (None until then).
+        """
+        return self._dna_node_id
 
     @property
     def dna_node_child(self):
@@ -74,6 +99,49 @@ class DNANode(object):
     def dna_node_prev_sib(self):
         return self._dna_node_prev_sib
 
+    def dna_node_attrs(self):
+        """
+        Return a dict of the node's data attributes (everything except the
+        chain links), including any kept in columns.
+        """
+        attrs = dict((name, value) for name, value in vars(self).items()
+                     if not name.startswith('_dna_node_'))
+        if self._dna_node_columns is not None:
+            attrs.update(self._dna_node_columns.node_values(self))
+        return attrs
+
+    def dna_node_copy(self):
+        """
+        Return a shallow copy of the node that is not linked into any chain.
+        """
+        node = copy.copy(self)
+        node._dna_node_child = None
+        node._dna_node_parent = None
+        node._dna_node_next_sib = None
+        node._dna_node_prev_sib = None
+        node._dna_node_id = None
+        node._dna_node_slot = None
+        node._dna_node_columns = None
+        if self._dna_node_columns is not None:
+            node.__dict__.update(self._dna_node_columns.node_values(self))
+        return node
+
+    def __deepcopy__(self, memo):
+        """
+        Return a copy of the node, not linked into any chain, with deep copies
+        of its attributes.  The chain links are never followed.
+        """
+        if id(_SHARE_NODES) in memo:
+            return self
+
+        node = self.dna_node_copy()
+        memo[id(self)] = node
+        values = node.__dict__
+        for name, value in list(values.items()):
+            if not name.startswith('_dna_node_'):
+                values[name] = copy.deepcopy(value, memo)
+        return node
+
 
 class DNACrawlerException(Exception):
     pass
@@ -115,10 +183,10 @@ class DNACrawler(object):
     def current_node(self):
         return self.__node
 
-    def next_node(self):
+    def next_node(self, descend=True):
         """
         Move to and return the next node in the DNA.  Returns None if there is
-        no next.
+        no next.  If descend is False the current node's children are skipped.
         """
         cur_node = self.__node
 
@@ -127,7 +195,7 @@ class DNACrawler(object):
 
         stack = self.__parent_node_stack
 
-        if cur_node.dna_node_child is not None:
+        if descend and cur_node.dna_node_child is not None:
             stack.append(cur_node)
             self.__node = cur_node.dna_node_child
         elif cur_node.dna_node_next_sib is not None:
@@ -192,15 +260,111 @@ class DNACrawler(object):
         self.__node = cur_node.dna_node_next_sib
         return self.__node
 
-    def crawl(self):
+    def prev_node(self):
+        """
+        Move to and return the previous node in the DNA (the reverse of
+        next_node).  Returns None if there is no previous.
+        """
+        cur_node = self.__node
+
+        if cur_node is None:
+            return None
+
+        stack = self.__parent_node_stack
+        node = cur_node.dna_node_prev_sib
+
+        if node is not None:
+            # The previous node is the last one in the previous sibling's
+            # subtree.
+            while node.dna_node_child is not None:
+                stack.append(node)
+                node = node.dna_node_child
+                while node.dna_node_next_sib is not None:
+                    node = node.dna_node_next_sib
+            self.__node = node
+        elif stack:
+            # First in a local chain, the previous node is the parent.
+            self.__node = stack.pop()
+        else:
+            self.__node = None
+
+        return self.__node
+
+    def crawl(self, max_depth=None, prune=None):
         """
         Traverse the entire structure from the current node to the end.
+
+        Nodes deeper than max_depth levels below the current node are not
+        visited.  Nodes for which prune(node) is true are not returned and
+        their subtrees are not visited.
         """
 
+        stack = self.__parent_node_stack
+        base = len(stack)
         node = self.__node
         while node is not None:
+            if prune is not None and prune(node):
+                node = self.next_node(False)
+                continue
             yield node
-            node = self.next_node()
+            node = self.next_node(
+                max_depth is None or len(stack) - base < max_depth)
+
+    def crawl_reverse(self):
+        """
+        Traverse the structure backwards from the current node to the start.
+        """
+
+        node = self.__node
+        while node is not None:
+            yield node
+            node = self.prev_node()
+
+    def crawl_levels(self, max_depth=None, prune=None):
+        """
+        Traverse the current node, the siblings coming after it and all their
+        descendants in level-order (breadth-first).  max_depth and prune work
+        as in crawl.  Does not move the crawler.
+        """
+
+        queue = deque([(self.__node, 0)])
+        while queue:
+            node, depth = queue.popleft()
+            while node is not None:
+                if prune is None or not prune(node):
+                    yield node
+                    if node.dna_node_child is not None and (
+                            max_depth is None or depth < max_depth):
+                        queue.append((node.dna_node_child, depth + 1))
+                node = node.dna_node_next_sib
+
+    def crawl_post(self, max_depth=None, prune=None):
+        """
+        Traverse the current node, the siblings coming after it and all their
+        descendants in post-order (children before their parent).  max_depth
+        and prune work as in crawl.  Does not move the crawler.
+        """
+
+        stack = []
+        node, depth = self.__node, 0
+        while True:
+            while node is not None:
+                if prune is not None and prune(node):
+                    node = node.dna_node_next_sib
+                elif node.dna_node_child is not None and (
+                        max_depth is None or depth < max_depth):
+                    stack.append((node, depth))
+                    node, depth = node.dna_node_child, depth + 1
+                else:
+                    yield node
+                    node = node.dna_node_next_sib
+
+            if not stack:
+                return
+
+            node, depth = stack.pop()
+            yield node
+            node = node.dna_node_next_sib
 
     def crawl_indents(self):
         """
@@ -259,7 +423,7 @@ class DNACrawler(object):
                 "Cannot insert, no node specified and current node is None.")
 
         if ref_node is self.dna.head:
-            self.dna.head = node
+            self.dna._move_head(node)
 
         prev_n = ref_node._dna_node_prev_sib
         parent = ref_node._dna_node_parent
@@ -318,7 +482,7 @@ class DNACrawler(object):
         # If the node we are inserting as a child is the DNA head, then we
         # need to update the head.
         if ref_node is self.dna.head:
-            self.dna.head = self.get_origin(ref_node)
+            self.dna._move_head(self.get_origin(ref_node))
 
         child = ref_node._dna_node_child
 
@@ -350,7 +514,7 @@ class DNACrawler(object):
 
         # Update the DNA head if we are removing it.
         if node is self.dna.head:
-            self.dna.head = next_n
+            self.dna._move_head(next_n)
 
         node._dna_node_next_sib = None
         node._dna_node_prev_sib = None
@@ -394,16 +558,19 @@ class DNACrawler(object):
     def add_before(self, node=None, ref_node=None):
         node = self.__create_node(node)
         ref_node = self.__insert_before(node, ref_node)
+        self.dna.register_subtree(node)
         self.emit(('c', '+', node, 'b', ref_node))
 
     def add_after(self, node=None, ref_node=None):
         node = self.__create_node(node)
         ref_node = self.__insert_after(node, ref_node)
+        self.dna.register_subtree(node)
         self.emit(('c', '+', node, 'a', ref_node))
 
     def add_child(self, node=None, ref_node=None):
         node = self.__create_node(node)
         ref_node = self.__insert_child(node, ref_node)
+        self.dna.register_subtree(node)
         self.emit(('c', '+', node, 'c', ref_node))
 
     def move_before(self, node, ref_node=None):
@@ -422,12 +589,140 @@ class DNACrawler(object):
         self.emit(('c', '^', node, 'c', ref_node))
 
     def remove(self, node=None):
+        node = self.__node if node is None else node
         self.__remove(node)
         self.emit(('c', '-', node))
 
+    # - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ -
+    # subtrees
+    # - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ -
+
+    def detach(self, node=None):
+        """
+        Remove node, and with it its subtree, from the chain and return it.
+        Use current node if node is not specified.
+        """
+        node = self.__node if node is None else node
+        self.remove(node)
+        return node
+
+    def attach(self, node, where, ref_node=None):
+        """
+        Add a detached node (and its subtree) before ('b'), after ('a') or as
+        a child of ('c') ref_node, emitting a single event.  Use current node
+        if ref_node is not specified.
+        """
+        if (node.dna_node_parent is not None or
+                node.dna_node_prev_sib is not None or
+                node.dna_node_next_sib is not None):
+            raise DNACrawlerException(
+                "Cannot attach, node is still linked into a chain.")
+
+        if where == 'b':
+            self.add_before(node, ref_node)
+        elif where == 'a':
+            self.add_after(node, ref_node)
+        elif where == 'c':
+            self.add_child(node, ref_node)
+        else:
+            raise DNACrawlerException(
+                "Cannot attach, unknown placement {!r}.".format(where))
+
+    def clone_subtree(self, node=None, share_values=False):
+        """
+        Return a detached copy of node and all its descendants.  Use current
+        node if node is not specified.
+
+        Attribute values are deep-copied (with one memo for the whole subtree)
+        except for immutable ones, which are shared.  References to nodes in
+        the subtree are replaced by their copies, other nodes are shared.  If
+        share_values is true all values are shared, which is much faster when
+        the values are never mutated in place.
+
+        Works iteratively, so the depth and length of the subtree are not
+        limited by the recursion limit.
+        """
+        node = self.__node if node is None else node
+        if node is None:
+            raise DNACrawlerException(
+                "Cannot clone, no node specified and current node is None.")
+
+        # Every copy is made before any value is deep-copied, so that values
+        # referring to nodes in the subtree can be pointed at the copies.
+        memo = {id(_SHARE_NODES): True}
+        copies = []
+
+        def clone(n):
+            c = n.dna_node_copy()
+            memo[id(n)] = c
+            copies.append(c)
+            return c
+
+        root = clone(node)
+
+        # (first node of a chain to copy, copy of its parent)
+        stack = [(node.dna_node_child, root)]
+        while stack:
+            src, parent = stack.pop()
+            prev = None
+            while src is not None:
+                c = clone(src)
+                if prev is None:
+                    parent._dna_node_child = c
+                    c._dna_node_parent = parent
+                else:
+                    prev._dna_node_next_sib = c
+                    c._dna_node_prev_sib = prev
+
+                if src.dna_node_child is not None:
+                    stack.append((src.dna_node_child, c))
+
+                prev = c
+                src = src.dna_node_next_sib
+
+        if not share_values:
+            for c in copies:
+                values = c.__dict__
+                for name, value in list(values.items()):
+                    if (type(value) not in _IMMUTABLE and
+                            not name.startswith('_dna_node_')):
+                        values[name] = copy.deepcopy(value, memo)
+
+        return root
+
+    def set_attr(self, name, value, node=None):
+        """
+        Set an attribute on node.  Use current node if node is not specified.
+        Emits '+' if node didn't have the attribute yet, otherwise '^' (always
+        '^' for attributes kept in columns, see DNAColumn).
+        """
+        node = self.__node if node is None else node
+        if node is None:
+            raise DNACrawlerException(
+                "Cannot set attribute, no node specified and current node "
+                "is None.")
+
+        op = '^' if hasattr(node, name) else '+'
+        setattr(node, name, value)
+        self.emit(('n', op, node, name, value))
+
+    def del_attr(self, name, node=None):
+        """
+        Delete an attribute from node.  Use current node if node is not
+        specified.
+        """
+        node = self.__node if node is None else node
+        if node is None:
+            raise DNACrawlerException(
+                "Cannot delete attribute, no node specified and current node "
+                "is None.")
+
+        delattr(node, name)
+        self.emit(('n', '-', node, name))
+
     # - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ -
     # event emitting
     # - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ -
 
     def emit(self, event):
-        print(event)
+        self.dna.emit(event)
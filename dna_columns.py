@@ -0,0 +1,223 @@
+"""
+Columnar storage for node attributes.
+
+A DNA created with columns (a dict of attribute name -> NumPy dtype) keeps
+those attributes for all its nodes in NumPy arrays, one per column, instead of
+in each node's __dict__.  Every node added to the DNA gets a slot (an index
+into the arrays).  Node classes declare the attributes with DNAColumn so that
+reading and writing them goes to the arrays (attributes of classes that don't
+declare them stay in __dict__):
+
+    class Person(DNANode):
+        age = DNAColumn('age')
+
+    dna = DNA(columns={'age': 'i4'})
+
+RNAs can then aggregate with vectorised operations (see DNA.column) instead
+of crawling the chain and reading every node.
+
+Requires NumPy.
+"""
+
+
+import weakref
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+__globals__ = ('DNAColumn',
+               'DNAColumns')
+
+
+class DNAColumn(object):
+    """
+    Descriptor for a node attribute that is stored in a column.  Until the
+    node is added to a DNA (and after it has been copied out of one), or if
+    the node's DNA has no such column, the value is kept in the node's
+    __dict__ as usual.
+
+    While the value is in a column the attribute always exists (its value is
+    zero, or None, until set), so DNACrawler.set_attr reports setting it with
+    '^', never '+', and it can't be deleted.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, node, cls):
+        if node is None:
+            return self
+
+        columns = node._dna_node_columns
+        if columns is not None and self.name in columns:
+            return columns.arrays[self.name].item(node._dna_node_slot)
+
+        try:
+            return node.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name)
+
+    def __set__(self, node, value):
+        columns = node._dna_node_columns
+        if columns is not None and self.name in columns:
+            columns.arrays[self.name][node._dna_node_slot] = value
+        else:
+            node.__dict__[self.name] = value
+
+    def __delete__(self, node):
+        columns = node._dna_node_columns
+        if columns is not None and self.name in columns:
+            raise AttributeError(
+                "Cannot delete column attribute {}.".format(self.name))
+        try:
+            del node.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name)
+
+
+def _blank(dtype, size):
+    """
+    Return an array of size empty values (zero, or None for objects).
+    """
+    dtype = numpy.dtype(dtype)
+    if dtype.hasobject:
+        return numpy.full(size, None, dtype)
+    return numpy.zeros(size, dtype)
+
+
+class DNAColumns(object):
+    """
+    The column arrays owned by a DNA.
+
+        arrays      attribute name -> array, indexed by node slot
+        linked      bool array, true for the slots of nodes in the chain
+        declared    attribute name -> bool array, true for the slots of nodes
+                    whose class declares the column
+        size        number of slots handed out so far (the arrays may be
+                    longer)
+    """
+
+    def __init__(self, dtypes, capacity=64):
+        if numpy is None:
+            raise ImportError("Column storage requires numpy.")
+
+        self.dtypes = dict(dtypes)
+        self.arrays = dict((name, _blank(dtype, capacity))
+                           for name, dtype in self.dtypes.items())
+        self.linked = numpy.zeros(capacity, bool)
+        self.declared = dict((name, numpy.zeros(capacity, bool))
+                             for name in self.dtypes)
+        self.size = 0
+
+        self.__free = []
+        self.__refs = {}    # slot -> weakref to the node using it
+        self.__names = {}   # node class -> names of the columns it declares
+
+    def __contains__(self, name):
+        return name in self.dtypes
+
+    def attach(self, node):
+        """
+        Give node a slot and move its column values (if it has any) out of
+        its __dict__ into the arrays.  Only the columns node's class declares
+        with DNAColumn are moved, other attributes of the same name stay in
+        __dict__.
+        """
+        if node._dna_node_columns is self:
+            return
+
+        if node._dna_node_columns is not None:
+            values = node._dna_node_columns.node_values(node)
+            node._dna_node_columns.detach(node)
+            node.__dict__.update(values)
+
+        if self.__free:
+            slot = self.__free.pop()
+        else:
+            if self.size == len(self.linked):
+                self.__grow()
+            slot = self.size
+            self.size += 1
+
+        for name in self.__declared(type(node)):
+            if name in node.__dict__:
+                self.arrays[name][slot] = node.__dict__.pop(name)
+            self.declared[name][slot] = True
+        self.linked[slot] = True
+
+        node._dna_node_slot = slot
+        node._dna_node_columns = self
+        self.__refs[slot] = weakref.ref(node, self.__collected(slot))
+
+    def detach(self, node):
+        """
+        Release node's slot.  Its column values are lost, use node_values
+        first to keep them.
+        """
+        slot = node._dna_node_slot
+        del self.__refs[slot]
+        self.__release(slot)
+        node._dna_node_slot = None
+        node._dna_node_columns = None
+
+    def node_values(self, node):
+        """
+        Return a dict of node's column values.
+        """
+        slot = node._dna_node_slot
+        return dict((name, self.arrays[name].item(slot))
+                    for name in self.__declared(type(node)))
+
+    def set_linked(self, slots, linked):
+        self.linked[slots] = linked
+
+    def column(self, name, slots=None):
+        """
+        Return the values of a column for the given slots, or for every node
+        in the chain if slots is None.  Nodes whose class doesn't declare the
+        column are left out.
+        """
+        array = self.arrays[name]
+        declared = self.declared[name]
+        if slots is None:
+            size = self.size
+            return array[:size][self.linked[:size] & declared[:size]]
+        slots = numpy.asarray(slots, int)
+        return array[slots[declared[slots]]]
+
+    def __declared(self, cls):
+        names = self.__names.get(cls)
+        if names is None:
+            names = self.__names[cls] = tuple(
+                name for name in self.dtypes
+                if isinstance(getattr(cls, name, None), DNAColumn))
+        return names
+
+    def __grow(self):
+        capacity = len(self.linked)
+        for name, array in self.arrays.items():
+            self.arrays[name] = numpy.concatenate(
+                (array, _blank(self.dtypes[name], capacity)))
+        self.linked = numpy.concatenate(
+            (self.linked, numpy.zeros(capacity, bool)))
+        for name, declared in self.declared.items():
+            self.declared[name] = numpy.concatenate(
+                (declared, numpy.zeros(capacity, bool)))
+
+    def __release(self, slot):
+        for name, array in self.arrays.items():
+            # Don't keep objects alive through a dead slot.
+            array[slot] = _blank(self.dtypes[name], 1)[0]
+            self.declared[name][slot] = False
+        self.linked[slot] = False
+        self.__free.append(slot)
+
+    def __collected(self, slot):
+        def callback(ref):
+            if self.__refs.get(slot) is ref:
+                del self.__refs[slot]
+                self.__release(slot)
+        return callback
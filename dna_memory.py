@@ -0,0 +1,169 @@
+"""
+Memory introspection for DNA chains and RNAs.
+
+    footprint               total node count and estimated bytes of a DNA
+    subtree_footprints      node counts and estimated bytes per subtree
+    detached_nodes          nodes removed from the chain that are still alive
+    AllocationTrace         tracemalloc snapshot diff around a block of code
+
+Sizes are estimates: a node's size is the size of the node object, its
+__dict__ and its attribute values (not what those values refer to), plus its
+share of any column arrays.
+"""
+
+
+import sys
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from dna import _walk
+
+
+__globals__ = ('node_size',
+               'footprint',
+               'subtree_footprints',
+               'detached_nodes',
+               'AllocationTrace')
+
+
+def node_size(node):
+    """
+    Estimate the bytes used by a single node.
+    """
+    size = sys.getsizeof(node) + sys.getsizeof(node.__dict__)
+    for name, value in node.__dict__.items():
+        if not name.startswith('_dna_node_'):
+            size += sys.getsizeof(value)
+
+    columns = node._dna_node_columns
+    if columns is not None:
+        for array in columns.arrays.values():
+            size += array.itemsize
+            if array.dtype.hasobject:
+                size += sys.getsizeof(array.item(node._dna_node_slot))
+
+    return size
+
+
+def footprint(dna):
+    """
+    Return (node count, estimated bytes) for the whole chain.  The bytes
+    include the unused capacity of any column arrays.
+    """
+    count = 0
+    size = 0
+    for node, _, _ in _walk(dna.head):
+        count += 1
+        size += node_size(node)
+
+    columns = dna.columns
+    if columns is not None:
+        unused = len(columns.linked) - columns.size
+        size += unused * sum(a.itemsize for a in columns.arrays.values())
+
+    return count, size
+
+
+def subtree_footprints(dna, max_depth=0):
+    """
+    Return a list of (node, depth, node count, estimated bytes) for every node
+    down to max_depth, in crawl order.  The count and bytes cover the node and
+    all its descendants.  Takes a single pass over the chain.
+    """
+    order = []
+    totals = {}
+    depths = {}
+    for node, parent, _ in _walk(dna.head):
+        order.append((node, parent))
+        depths[node] = 0 if parent is None else depths[parent] + 1
+        totals[node] = [1, node_size(node)]
+
+    # Children come after their parent in crawl order, so going backwards
+    # every subtree is complete before it is added to its parent.
+    for node, parent in reversed(order):
+        if parent is not None:
+            parent_total = totals[parent]
+            parent_total[0] += totals[node][0]
+            parent_total[1] += totals[node][1]
+
+    return [(node, depths[node], totals[node][0], totals[node][1])
+            for node, _ in order if depths[node] <= max_depth]
+
+
+def detached_nodes(dna):
+    """
+    Return the nodes that were in the chain (they have an id in dna) and are
+    still alive but are no longer reachable from the head.  Subtrees are
+    reported once, by their root.
+    """
+    reachable = set(id(node) for node, _, _ in _walk(dna.head))
+    detached = [n for n in dna.registered_nodes() if id(n) not in reachable]
+
+    # Drop the descendants of other detached nodes.
+    inner = set()
+    for node in detached:
+        for n, _, _ in _walk(node.dna_node_child):
+            inner.add(id(n))
+    return [n for n in detached if id(n) not in inner]
+
+
+class AllocationTrace(object):
+    """
+    Records the memory allocated (and not freed) inside a with block:
+
+        with AllocationTrace() as trace:
+            crawler.remove(node)
+        print(trace.size_diff)
+        for stat in trace.top(5):
+            print(stat)
+
+    Starts tracemalloc for the duration of the block if it isn't running
+    already.  Requires tracemalloc (Python 3.4+).
+    """
+
+    def __init__(self, key_type='lineno'):
+        if tracemalloc is None:
+            raise ImportError("AllocationTrace requires tracemalloc.")
+
+        self.key_type = key_type
+        self.stats = []
+        self.__started = False
+        self.__before = None
+
+    def __enter__(self):
+        self.__started = not tracemalloc.is_tracing()
+        if self.__started:
+            tracemalloc.start()
+        self.__before = self.__snapshot()
+        return self
+
+    def __exit__(self, *exc_info):
+        after = self.__snapshot()
+        if self.__started:
+            tracemalloc.stop()
+
+        self.stats = after.compare_to(self.__before, self.key_type)
+        self.__before = None
+        return False
+
+    @property
+    def size_diff(self):
+        """
+        Net bytes allocated inside the block.
+        """
+        return sum(stat.size_diff for stat in self.stats)
+
+    def top(self, limit=10):
+        """
+        Return the limit statistics with the largest growth.
+        """
+        return sorted(self.stats, key=lambda s: s.size_diff,
+                      reverse=True)[:limit]
+
+    @staticmethod
+    def __snapshot():
+        return tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__), ))
@@ -0,0 +1,304 @@
+"""
+Replicates a master DNA chain to read-only follower copies, typically in other
+processes.
+
+The master side (DNAReplicator) is linked to the master DNA like any RNA.  It
+encodes the chain events it receives, replacing node references with their
+integer ids, and sends them to its followers in numbered batches over
+multiprocessing connections (multiprocessing.Pipe ends or the connections
+made by multiprocessing.connection.Listener/Client over a Unix socket).
+
+A follower (DNAFollower) is bootstrapped with a snapshot of the whole chain and
+then replays every batch against its own DNA, so RNAs linked to the follower
+DNA see the same events as RNAs linked to the master.  Follower nodes are
+registered under the master's node ids.
+
+Messages:
+
+    ( s SEQ TIME SNAPSHOT )     snapshot of the chain as of batch SEQ
+    ( b SEQ TIME EVENTS )       batch of encoded events
+    ( x SEQ TIME None )         the master has stopped replicating
+
+Unless created with ack=False, followers acknowledge every message they apply
+with ( a SEQ ).
+"""
+
+
+import time
+
+from dna import DNA, _walk
+from dna_chain import DNANode
+
+
+__globals__ = ('DNAReplicationException',
+               'DNAReplicator',
+               'DNAFollower')
+
+
+# What a connection raises when the other end has gone away (OSError on
+# Python 3, IOError on Python 2, EOFError when reading).
+_CONNECTION_ERRORS = (EnvironmentError, EOFError)
+
+
+class DNAReplicationException(Exception):
+    pass
+
+
+class DNAReplicator(object):
+    """
+    Streams the events of a master DNA to any number of followers.
+
+    Events are collected until flush() is called (or max_batch events are
+    pending) and then sent as one batch.
+
+    A follower whose connection fails is dropped (and its connection appended
+    to dropped) rather than letting the error reach the edit on the master.
+    """
+
+    def __init__(self, dna, max_batch=None):
+        self.dna = dna
+        self.max_batch = max_batch
+        self.seq = 0
+
+        self.__pending = []
+        self.__followers = []   # [conn, acknowledged seq]
+        self.dropped = []
+
+        dna.link(self)
+
+    def node_id(self, node):
+        """
+        Return the id used on the wire for node (its id in the master DNA).
+        """
+        return self.dna.register(node)
+
+    @property
+    def pending(self):
+        return len(self.__pending)
+
+    def add_follower(self, conn):
+        """
+        Start replicating to conn.  Any pending events are flushed to the
+        existing followers first, then the new follower gets a snapshot.
+        """
+        self.flush()
+        conn.send(('s', self.seq, time.time(), self.__pack(self.dna.head)))
+        # Nothing acknowledged yet, the snapshot is outstanding.
+        self.__followers.append([conn, self.seq - 1])
+
+    def remove_follower(self, conn):
+        self.__followers = [f for f in self.__followers if f[0] is not conn]
+
+    def on_dna_event(self, event):
+        if self.__followers:
+            if self.dna.event_ids:
+                event = self.dna.decode_event(event)
+            self.__pending.append(self.__encode(event))
+            if self.max_batch and len(self.__pending) >= self.max_batch:
+                self.flush()
+
+    def flush(self):
+        """
+        Send the pending events to all followers as one batch.
+        """
+        if not self.__pending:
+            return
+
+        self.seq += 1
+        message = ('b', self.seq, time.time(), self.__pending)
+        self.__pending = []
+        self.__send(message)
+
+        # Keep the acknowledgements from piling up in the connections.
+        self.__read_acks()
+
+    def close(self):
+        """
+        Flush and tell all followers that replication has stopped.
+        """
+        self.flush()
+        self.__send(('x', self.seq, time.time(), None))
+        self.__followers = []
+        self.dna.unlink(self)
+
+    def lag(self):
+        """
+        Read any acknowledgements waiting from the followers and return how
+        many batches the furthest-behind follower has yet to apply.
+        """
+        self.__read_acks()
+        return max([self.seq - f[1] for f in self.__followers] or [0])
+
+    def __send(self, message):
+        for follower in list(self.__followers):
+            try:
+                follower[0].send(message)
+            except _CONNECTION_ERRORS:
+                self.__drop(follower[0])
+
+    def __read_acks(self):
+        for follower in list(self.__followers):
+            conn = follower[0]
+            try:
+                while conn.poll():
+                    follower[1] = conn.recv()[1]
+            except _CONNECTION_ERRORS:
+                self.__drop(conn)
+
+    def __drop(self, conn):
+        self.remove_follower(conn)
+        self.dropped.append(conn)
+
+    # - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ -
+    # encoding
+    # - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ - ~ -
+
+    def __pack(self, head, subtree=False):
+        """
+        Encode the chain starting at head as a list of
+        (id, parent id, class, attributes) in crawl order.  If subtree is
+        true only head and its descendants are encoded.
+        """
+        if head is None:
+            return []
+
+        node_id = self.node_id
+        entries = []
+        if subtree:
+            entries.append((node_id(head), None, type(head),
+                            head.dna_node_attrs()))
+            nodes = ((n, head if p is None else p)
+                     for n, p, _ in _walk(head.dna_node_child))
+        else:
+            nodes = ((n, p) for n, p, _ in _walk(head))
+
+        for node, parent in nodes:
+            entries.append((node_id(node),
+                            None if parent is None else node_id(parent),
+                            type(node),
+                            node.dna_node_attrs()))
+        return entries
+
+    def __encode(self, event):
+        if event[:2] == ('c', '+'):
+            node, where, ref = event[2:]
+            return ('c', '+', self.__pack(node, True), where,
+                    None if ref is None else self.node_id(ref))
+        return self.dna.encode_event(event)
+
+
+class DNAFollower(object):
+    """
+    Keeps a DNA in sync with a DNAReplicator on the other end of conn.
+
+    Metrics:
+        seq         last batch applied
+        batches     number of batches applied
+        events      number of events applied
+        lag         seconds between the master sending the last message and
+                    it being applied here
+    """
+
+    def __init__(self, conn, dna=None, ack=True):
+        self.conn = conn
+        self.dna = DNA() if dna is None else dna
+        self.ack = ack
+        self.seq = None
+        self.closed = False
+
+        self.batches = 0
+        self.events = 0
+        self.lag = 0.0
+
+    def node(self, node_id):
+        return self.dna.node(node_id)
+
+    def poll(self, timeout=0.0):
+        """
+        Apply all the messages that are available within timeout.  Returns the
+        number of messages applied.
+        """
+        count = 0
+        while not self.closed and self.conn.poll(timeout):
+            self.receive()
+            count += 1
+            timeout = 0.0
+        return count
+
+    def receive(self):
+        """
+        Block until the next message arrives and apply it.
+        """
+        kind, seq, sent, payload = self.conn.recv()
+
+        if kind == 's':
+            self.__bootstrap(payload)
+        elif kind == 'x':
+            self.closed = True
+        elif self.seq is None or seq != self.seq + 1:
+            raise DNAReplicationException(
+                "Expected batch {} but received batch {}.".format(
+                    None if self.seq is None else self.seq + 1, seq))
+        else:
+            events = []
+            for event in payload:
+                events.extend(self.__decode(event))
+            self.dna.apply_diff(events)
+            self.batches += 1
+            self.events += len(payload)
+
+        self.seq = seq
+        self.lag = time.time() - sent
+        if self.ack and not self.closed:
+            self.conn.send(('a', seq))
+
+    def __bootstrap(self, entries):
+        self.dna.head = None
+
+        roots = self.__unpack(entries)
+        if roots:
+            # The chain is empty, so rather than adding them relative to
+            # anything the unpacked chain simply becomes the chain.
+            self.dna.head = roots[0]
+
+    def __unpack(self, entries):
+        """
+        Create the nodes described by entries, registered under the master's
+        ids and linked to each other directly (without events), and return
+        the top-level ones.  Consecutive top-level nodes are siblings.
+        """
+        nodes = {}
+        last_child = {}
+        roots = []
+
+        for node_id, parent_id, cls, attrs in entries:
+            node = cls.__new__(cls)
+            DNANode.__init__(node)
+            node.__dict__.update(attrs)
+            self.dna.register(node, node_id)
+            nodes[node_id] = node
+
+            if parent_id is None:
+                prev = roots[-1] if roots else None
+                roots.append(node)
+            else:
+                prev = last_child.get(parent_id)
+                last_child[parent_id] = node
+                if prev is None:
+                    parent = nodes[parent_id]
+                    parent._dna_node_child = node
+                    node._dna_node_parent = parent
+
+            if prev is not None:
+                prev._dna_node_next_sib = node
+                node._dna_node_prev_sib = prev
+
+        return roots
+
+    def __decode(self, event):
+        if event[:2] == ('c', '+'):
+            entries, where, ref_id = event[2:]
+            root = self.__unpack(entries)[0]
+            ref = None if ref_id is None else self.dna.node(ref_id)
+            return [('c', '+', root, where, ref)]
+        return [self.dna.decode_event(event)]
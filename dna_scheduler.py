@@ -0,0 +1,230 @@
+"""
+Coalesces the events of a DNA for RNAs that only need to catch up once in a
+while, e.g. once per frame for RNAs that draw something.
+
+The scheduler is linked to the DNA like any RNA and keeps a queue of events for
+each RNA linked through it.  Calling tick() (e.g. from a Kivy
+Clock.schedule_interval) delivers each queue, as a list, to the RNA's
+on_dna_events at most once per interval.
+
+While queued, events are merged so that a queue holds at most one chain event
+per node and one node event per attribute:
+
+    - repeated moves of a node are reduced to the last one, and a node that
+      is added and then moved is reported as added at its final position
+    - a node that is added and then removed is not reported at all
+    - a node that is removed and added again is reported as moved
+    - attribute changes are reduced to the final value
+
+When the batch is delivered, events that the chain as it is then makes
+redundant are dropped:
+
+    - chain and attribute events for nodes inside a subtree that is still
+      removed
+    - additions of, and attribute changes to, nodes inside a subtree added in
+      the same batch, the RNA sees the whole subtree as new anyway
+
+Each event takes the place of the last event it was merged with, so a batch
+describes what has changed, not how.  RNAs should read positions from the
+chain rather than replay the batch.
+"""
+
+
+import time
+from collections import OrderedDict
+
+from dna import _subtree
+
+
+__globals__ = ('DNAScheduler', )
+
+
+def _merge_attr(prev, event):
+    """
+    Merge two node events for the same attribute.  Returns None if they cancel
+    out.
+    """
+    if prev[1] == '+':
+        if event[1] == '-':
+            return None
+        return ('n', '+') + event[2:]
+    elif prev[1] == '-' and event[1] != '-':
+        return ('n', '^') + event[2:]
+    return event
+
+
+def _parent(node):
+    while node.dna_node_prev_sib is not None:
+        node = node.dna_node_prev_sib
+    return node.dna_node_parent
+
+
+def _in_added(node, added):
+    """
+    Is node, or one of its ancestors, in added?
+    """
+    while added and node is not None:
+        if node in added:
+            return True
+        node = _parent(node)
+    return False
+
+
+class _Queue(object):
+
+    def __init__(self, rna, interval):
+        self.rna = rna
+        self.interval = interval
+        self.last = None
+        self.requested = False
+
+        self.events = OrderedDict()
+        self.cancelled = set()  # nodes added and then removed in this batch
+
+    def push(self, event):
+        context, op, node = event[:3]
+        events = self.events
+
+        if context == 'n':
+            key = ('n', node, event[3])
+            prev = events.pop(key, None)
+            if prev is not None:
+                event = _merge_attr(prev, event)
+                if event is None:
+                    return
+            events[key] = event
+            return
+
+        key = ('c', node)
+        prev = events.pop(key, None)
+
+        if op == '-':
+            if prev is not None and prev[1] == '+':
+                self.cancelled.add(node)
+                return
+        elif prev is not None:
+            if prev[1] == '+':
+                event = ('c', '+') + event[2:]
+            elif prev[1] == '-':
+                event = ('c', '^') + event[2:]
+
+        events[key] = event
+
+    def pop(self):
+        """
+        Return the queued events, minus those made redundant by the chain as
+        it is now, and start a new batch.
+        """
+        chain = dict((key[1], event) for key, event in self.events.items()
+                     if key[0] == 'c')
+
+        # Everything inside a subtree that is still out of the chain.
+        removed = [n for n, event in chain.items() if event[1] == '-']
+        removed.extend(n for n in self.cancelled if n not in chain)
+        gone = set()
+        for root in removed:
+            gone.update(_subtree(root))
+
+        added = set(n for n, event in chain.items() if event[1] == '+')
+
+        events = []
+        for key, event in self.events.items():
+            node = key[1]
+            if event[:2] == ('c', '-'):
+                pass
+            elif node in gone:
+                continue
+            elif event[:2] == ('c', '+'):
+                if _in_added(_parent(node), added):
+                    continue
+            elif key[0] == 'n' and _in_added(node, added):
+                continue
+            events.append(event)
+
+        self.events = OrderedDict()
+        self.cancelled = set()
+        self.requested = False
+        return events
+
+
+class DNAScheduler(object):
+    """
+    Collects the events of dna for each linked RNA and delivers them,
+    coalesced, to rna.on_dna_events(events) at most once per interval
+    (seconds, as measured by clock).
+    """
+
+    def __init__(self, dna, interval=1 / 60., clock=time.time):
+        self.dna = dna
+        self.interval = interval
+        self.clock = clock
+
+        self.__queues = []
+
+        dna.link(self)
+
+    def link(self, rna, interval=None):
+        """
+        Deliver events to rna, every interval seconds (the scheduler's
+        interval if not specified).
+        """
+        if self.__find(rna) is None:
+            self.__queues.append(
+                _Queue(rna, self.interval if interval is None else interval))
+
+    def unlink(self, rna):
+        queue = self.__find(rna)
+        if queue is not None:
+            self.__queues.remove(queue)
+
+    def request(self, rna):
+        """
+        Make the next delivery to rna happen even if it has no events, e.g. to
+        have it redraw for something that isn't a DNA change.  Does nothing if
+        rna isn't linked.
+        """
+        queue = self.__find(rna)
+        if queue is not None:
+            queue.requested = True
+
+    def on_dna_event(self, event):
+        if self.dna.event_ids:
+            event = self.dna.decode_event(event)
+        for queue in self.__queues:
+            queue.push(event)
+
+    def tick(self, *args):
+        """
+        Deliver to every RNA whose interval has passed since its last
+        delivery.  Accepts (and ignores) any arguments so it can be scheduled
+        directly with a clock.
+        """
+        now = self.clock()
+        for queue in self.__queues:
+            if queue.last is None or now - queue.last >= queue.interval:
+                self.__deliver(queue, now)
+
+    def flush(self):
+        """
+        Deliver to every RNA now.
+        """
+        now = self.clock()
+        for queue in self.__queues:
+            self.__deliver(queue, now)
+
+    def __find(self, rna):
+        for queue in self.__queues:
+            if queue.rna is rna:
+                return queue
+        return None
+
+    def __deliver(self, queue, now):
+        if not queue.events and not queue.requested:
+            return
+
+        events = queue.pop()
+        if self.dna.event_ids:
+            events = [self.dna.encode_event(e) for e in events]
+
+        queue.last = now
+        queue.rna.on_dna_events(events)
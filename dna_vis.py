@@ -6,6 +6,7 @@ Uses Kivy to present an interactive visualization of the DNA chain structure.
 
 
 from kivy.app import runTouchApp
+from kivy.clock import Clock
 from kivy.uix.widget import Widget
 from kivy.uix.label import Label
 from kivy.properties import ListProperty, NumericProperty
@@ -13,6 +14,7 @@ from kivy.lang import Builder
 
 from dna_chain import DNANode
 from dna import DNA
+from dna_scheduler import DNAScheduler
 
 
 DNANode.__repr__ = lambda a: str(a.name)
@@ -46,8 +48,16 @@ class DNAVis(Widget):
         self.dna = DNA()
         self.crawler = self.dna.spawn_crawler()
 
+        # Redraw at most once per frame, however many edits are made.
+        self.scheduler = DNAScheduler(self.dna, interval=0)
+        self.scheduler.link(self)
+        Clock.schedule_interval(self.scheduler.tick, 0)
+
         self.bind(size=self.redraw, pos=self.redraw)
 
+    def on_dna_events(self, events):
+        self.redraw()
+
     def redraw(self, *ar):
         for w in self.children[:]:
             if isinstance(w, NodeVis):
@@ -97,7 +107,8 @@ class DNAVis(Widget):
         except (NameError, SyntaxError, AttributeError, TypeError) as err:
             print(err)
 
-        self.redraw()
+        # The crawler may have moved without changing the DNA.
+        self.scheduler.request(self)
 
 
 Builder.load_string("""
@@ -123,8 +134,6 @@ Builder.load_string("""
 
 
 if __name__ == '__main__':
-    from kivy.clock import Clock
-
     dv = DNAVis()
 
     def the_deeds(*ar):
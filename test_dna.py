@@ -0,0 +1,256 @@
+"""
+Test the DNA-level functionality.
+"""
+
+
+import gc
+import unittest
+from operator import add, attrgetter
+
+from dna import DNA
+from test_dna_chain import TestNode
+
+
+def build(spec, **kwargs):
+    """
+    Build a DNA from a nested spec.  Each item is a name, or a tuple of a name
+    and a list of child items.
+    """
+
+    dna = DNA(node_key=attrgetter('name'), **kwargs)
+    crawler = dna.spawn_crawler()
+
+    def add_chain(items, parent):
+        prev = None
+        for item in items:
+            name, children = (item, []) if isinstance(item, str) else item
+            node = TestNode(name)
+            if prev is not None:
+                crawler.add_after(node, prev)
+            elif parent is not None:
+                crawler.add_child(node, parent)
+            else:
+                dna.head = node
+            add_chain(children, node)
+            prev = node
+
+    add_chain(spec, None)
+    return dna
+
+
+def shape(dna):
+    """
+    Return a list of (name, depth) for the chain, in crawl order.
+    """
+
+    crawler = dna.spawn_crawler()
+    depth = 0
+    result = []
+    for node, indent in crawler.crawl_indents():
+        depth += indent
+        result.append((node.name, depth))
+    return result
+
+
+def nodes(dna):
+    return dict((n.name, n) for n in dna.spawn_crawler().crawl())
+
+
+def name_list(node):
+    return [node.name]
+
+
+def name_length(node):
+    return len(node.name)
+
+
+def keep_first(first, other):
+    return first
+
+
+class test_diff(unittest.TestCase):
+
+    def check(self, old_spec, new_spec):
+        old = build(old_spec)
+        new = build(new_spec)
+        before = nodes(old)
+
+        events = old.diff(new)
+        old.apply_diff(events)
+
+        self.assertEqual(shape(old), shape(new))
+        after = nodes(old)
+        for name in set(before) & set(after):
+            self.assertIs(before[name], after[name])
+
+        return events
+
+    def test_1_identical(self):
+        events = self.check(['a', ('b', ['c', 'd']), 'e'],
+                            ['a', ('b', ['c', 'd']), 'e'])
+        self.assertEqual(events, [])
+
+    def test_2_single_move(self):
+        events = self.check(['a', 'b', 'c', 'd', 'e'],
+                            ['a', 'c', 'd', 'e', 'b'])
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0][:2], ('c', '^'))
+
+    def test_3_add_and_remove(self):
+        events = self.check(['a', ('b', ['c']), 'd'],
+                            ['a', ('x', ['c', 'y']), 'd'])
+        ops = sorted(e[:2] for e in events)
+        self.assertEqual(ops, [('c', '+'), ('c', '+'),
+                               ('c', '-'), ('c', '^')])
+
+    def test_4_reparent(self):
+        self.check([('a', ['b', ('c', ['d'])]), 'e'],
+                   [('d', ['c', ('a', ['e'])]), 'b'])
+
+    def test_5_new_head(self):
+        self.check(['a', 'b'], ['x', 'b', 'a'])
+
+    def test_6_remove_all(self):
+        dna = build(['a', ('b', ['c'])])
+        dna.apply_diff(dna.diff(DNA()))
+        self.assertIsNone(dna.head)
+
+    def test_7_attrs(self):
+        old = build(['a', 'b'])
+        new = build(['a', 'b'])
+        na, nb = nodes(new)['a'], nodes(new)['b']
+        na.age = 3
+        nodes(old)['b'].age = 1
+        nb.age = 2
+        nodes(old)['b'].pie = 'apple'
+
+        events = old.diff(new)
+        self.assertEqual(
+            [e[:2] + e[3:] for e in events],
+            [('n', '+', 'age', 3), ('n', '^', 'age', 2), ('n', '-', 'pie')])
+
+        old.apply_diff(events)
+        self.assertEqual(nodes(old)['a'].age, 3)
+        self.assertEqual(nodes(old)['b'].age, 2)
+        self.assertFalse(hasattr(nodes(old)['b'], 'pie'))
+
+    def test_8_fill_empty(self):
+        received = []
+
+        class RNA(object):
+            def on_dna_event(self, event):
+                received.append(event)
+
+        dna = DNA(node_key=attrgetter('name'), event_ids=True)
+        dna.link(RNA())
+        events = dna.diff(build(['a', ('b', ['c'])]))
+        self.assertEqual(events[0][:2] + events[0][3:], ('c', '+', 'b', None))
+
+        dna.apply_diff(events)
+        self.assertEqual(shape(dna), [('a', 0), ('b', 0), ('c', 1)])
+        self.assertEqual(received[0],
+                         ('c', '+', dna.head.dna_node_id, 'b', None))
+        self.assertEqual(dna.decode_event(received[0])[2], dna.head)
+
+
+class test_node_ids(unittest.TestCase):
+
+    def setUp(self):
+        self.dna = build(['a', ('b', ['c']), 'd'])
+        self.crawler = self.dna.spawn_crawler()
+        self.nodes = nodes(self.dna)
+
+    def test_1_registry(self):
+        ids = set()
+        for node in self.nodes.values():
+            self.assertIs(self.dna.node(node.dna_node_id), node)
+            ids.add(node.dna_node_id)
+        self.assertEqual(len(ids), 4)
+
+        e = TestNode('e')
+        self.assertIsNone(e.dna_node_id)
+        self.crawler.add_child(e, self.nodes['d'])
+        self.assertNotIn(e.dna_node_id, ids)
+        self.assertIs(self.dna.node(e.dna_node_id), e)
+
+    def test_2_subtree(self):
+        b = self.nodes['b']
+        self.crawler.remove(b)
+        self.crawler.add_after(b, self.nodes['d'])
+        self.assertEqual(b.dna_node_id, self.nodes['b'].dna_node_id)
+
+        f = TestNode('f')
+        g = TestNode('g')
+        DNA().spawn_crawler().add_child(g, f)
+        self.crawler.add_after(f, self.nodes['a'])
+        self.assertIs(self.dna.node(g.dna_node_id), g)
+
+    def test_3_weak(self):
+        c_id = self.nodes['c'].dna_node_id
+        self.crawler.remove(self.nodes['c'])
+        del self.nodes['c']
+        gc.collect()
+        self.assertRaises(KeyError, self.dna.node, c_id)
+
+    def test_4_copy(self):
+        self.assertIsNone(self.nodes['a'].dna_node_copy().dna_node_id)
+
+    def test_5_event_ids(self):
+        received = []
+
+        class RNA(object):
+            def on_dna_event(self, event):
+                received.append(event)
+
+        self.dna.link(RNA())
+        self.dna.event_ids = True
+        self.crawler.move_after(self.nodes['a'], self.nodes['d'])
+        self.crawler.set_attr('age', 2, self.nodes['c'])
+
+        self.assertEqual(received, [
+            ('c', '^', self.nodes['a'].dna_node_id, 'a',
+             self.nodes['d'].dna_node_id),
+            ('n', '+', self.nodes['c'].dna_node_id, 'age', 2)])
+        for event in received:
+            self.assertEqual(
+                self.dna.encode_event(self.dna.decode_event(event)), event)
+
+
+class test_map_reduce(unittest.TestCase):
+
+    def setUp(self):
+        spec = [('t{}'.format(i), ['c{}.{}'.format(i, j) for j in range(9)])
+                for i in range(10)]
+        self.dna = build(spec)
+        self.order = [n.name for n in self.dna.spawn_crawler().crawl()]
+
+    def test_1_crawl_order(self):
+        for workers in (1, 3):
+            self.assertEqual(
+                self.dna.map_reduce(name_list, add, workers=workers),
+                self.order)
+
+    def test_2_initial(self):
+        total = sum(len(name) for name in self.order)
+        self.assertEqual(
+            self.dna.map_reduce(name_length, add, 10, workers=2,
+                                chunk_size=7),
+            total + 10)
+
+    def test_3_empty(self):
+        self.assertEqual(DNA().map_reduce(name_length, add, 0), 0)
+        self.assertIsNone(DNA().map_reduce(name_length, add))
+
+    def test_4_initial_none(self):
+        for workers in (1, 2):
+            self.assertIsNone(
+                self.dna.map_reduce(name_length, keep_first, None,
+                                    workers=workers))
+            self.assertEqual(
+                self.dna.map_reduce(name_length, keep_first,
+                                    workers=workers),
+                len(self.order[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
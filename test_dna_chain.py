@@ -5,9 +5,10 @@ Test the DNA chain structure and DNACrawler functionality.
 """
 
 
+import copy
 import unittest
 
-from dna_chain import DNANode
+from dna_chain import DNACrawlerException, DNANode
 from dna import DNA
 
 
@@ -203,5 +204,210 @@ class tests(test_utils):
         self.assertRaises(StopIteration, gen.next)
 
 
+class test_traversal(test_utils):
+    """
+    Tests the traversal modes on this structure:
+
+        n1 -- n2 -- n3
+        |      |
+        |      n4
+        n5
+    """
+
+    def setUp(self):
+        self.dna = DNA()
+
+        self.n1 = TestNode('node1')
+        self.n2 = TestNode('node2')
+        self.n3 = TestNode('node3')
+        self.n4 = TestNode('node4')
+        self.n5 = TestNode('node5')
+
+        self.dna.head = self.n1
+        c = self.crawler = self.dna.spawn_crawler()
+        c.add_child(self.n2, self.n1)
+        c.add_child(self.n3, self.n2)
+        c.add_after(self.n4, self.n2)
+        c.add_after(self.n5, self.n1)
+
+    def names(self, gen):
+        return [n.name[-1] for n in gen]
+
+    def test_1_max_depth(self):
+        c = self.crawler
+        self.assertEqual(self.names(c.crawl(max_depth=1)), list('1245'))
+        c.reset()
+        self.assertEqual(self.names(c.crawl(max_depth=0)), list('15'))
+
+    def test_2_prune(self):
+        visited = []
+
+        def prune(node):
+            visited.append(node)
+            return node is self.n2
+
+        c = self.crawler
+        self.assertEqual(self.names(c.crawl(prune=prune)), list('145'))
+        self.assertNotIn(self.n3, visited)
+
+    def test_3_prev_node(self):
+        c = self.crawler
+        c.attach_to(self.n1)
+        for _ in range(4):
+            c.next_node()
+
+        self.assertIs(self.n5, c.current_node)
+        self.assertIs(self.n4, c.prev_node())
+        self.assertIs(self.n3, c.prev_node())
+        self.assertIs(self.n2, c.prev_node())
+        self.assertIs(self.n1, c.prev_node())
+        self.assertIsNone(c.prev_node())
+
+    def test_4_crawl_reverse(self):
+        c = self.crawler
+        c.attach_to(self.n5)
+        self.assertEqual(self.names(c.crawl_reverse()), list('54321'))
+
+    def test_5_crawl_levels(self):
+        c = self.crawler
+        self.assertEqual(self.names(c.crawl_levels()), list('15243'))
+        self.assertEqual(self.names(c.crawl_levels(max_depth=1)),
+                         list('1524'))
+        self.assertEqual(
+            self.names(c.crawl_levels(prune=lambda n: n is self.n2)),
+            list('154'))
+        self.assertIs(self.n1, c.current_node)
+
+    def test_6_crawl_post(self):
+        c = self.crawler
+        self.assertEqual(self.names(c.crawl_post()), list('32415'))
+        self.assertEqual(self.names(c.crawl_post(max_depth=1)),
+                         list('2415'))
+        self.assertEqual(
+            self.names(c.crawl_post(prune=lambda n: n is self.n2)),
+            list('415'))
+        self.assertIs(self.n1, c.current_node)
+
+
+class test_subtrees(test_utils):
+    """
+    Tests cloning, detaching and attaching subtrees of this structure:
+
+        n1 -- n2 -- n3
+        |      |
+        |      n4
+        n5
+    """
+
+    def setUp(self):
+        self.events = []
+        self.dna = DNA()
+        self.dna.link(self)
+
+        self.n1 = TestNode('node1')
+        self.n2 = TestNode('node2')
+        self.n3 = TestNode('node3')
+        self.n4 = TestNode('node4')
+        self.n5 = TestNode('node5')
+        self.n2.tags = ['a']
+        self.n3.tags = self.n2.tags
+
+        self.dna.head = self.n1
+        c = self.crawler = self.dna.spawn_crawler()
+        c.add_child(self.n2, self.n1)
+        c.add_child(self.n3, self.n2)
+        c.add_after(self.n4, self.n2)
+        c.add_after(self.n5, self.n1)
+        del self.events[:]
+
+    def on_dna_event(self, event):
+        self.events.append(event)
+
+    def test_1_clone(self):
+        clone = self.crawler.clone_subtree(self.n1)
+        self.assertEqual(self.events, [])
+        self.assertIsNone(clone.dna_node_next_sib)
+        self.assertIsNone(clone.dna_node_id)
+
+        c2 = clone.dna_node_child
+        c3 = c2.dna_node_child
+        c4 = c2.dna_node_next_sib
+        self.check_child(clone, c2)
+        self.check_child(c2, c3)
+        self.check_seq(c2, c4)
+        self.assertEqual([n.name for n in (clone, c2, c3, c4)],
+                         ['node1', 'node2', 'node3', 'node4'])
+
+        # Mutable values are copied, but shared between the copies as they
+        # were between the originals.
+        self.assertEqual(c2.tags, ['a'])
+        self.assertIsNot(c2.tags, self.n2.tags)
+        self.assertIs(c2.tags, c3.tags)
+        self.assertIs(c2.name, self.n2.name)
+
+    def test_2_clone_shared(self):
+        clone = self.crawler.clone_subtree(self.n2, share_values=True)
+        self.assertIs(clone.tags, self.n2.tags)
+
+    def test_3_clone_deep(self):
+        c = self.crawler
+        node = self.n5
+        for i in range(5000):
+            child = TestNode(i)
+            c.add_child(child, node)
+            node = child
+
+        clone = c.clone_subtree(self.n5)
+        depth = 0
+        while clone.dna_node_child is not None:
+            clone = clone.dna_node_child
+            depth += 1
+        self.assertEqual(depth, 5000)
+        self.assertEqual(clone.name, 4999)
+
+    def test_4_clone_node_values(self):
+        c = self.crawler
+        prev = self.n5
+        for i in range(5000):
+            sib = TestNode(i)
+            c.add_after(sib, prev)
+            prev = sib
+
+        self.n2.tags = [self.n3, prev]
+        clone = c.clone_subtree(self.n2)
+        self.assertIs(clone.tags[0], clone.dna_node_child)
+        self.assertIs(clone.tags[1], prev)
+
+        # Outside of a clone, copying a node never follows its links.
+        node = copy.deepcopy(prev.dna_node_prev_sib)
+        self.assertIsNone(node.dna_node_prev_sib)
+        self.assertEqual(node.name, 4998)
+
+    def test_5_detach_attach(self):
+        c = self.crawler
+        self.assertIs(c.detach(self.n2), self.n2)
+        c.attach(self.n2, 'a', self.n5)
+
+        self.check_seq(self.n5, self.n2)
+        self.check_child(self.n2, self.n3)
+        self.check_child(self.n1, self.n4)
+        self.assertEqual(self.events, [('c', '-', self.n2),
+                                       ('c', '+', self.n2, 'a', self.n5)])
+
+    def test_6_attach_clone(self):
+        c = self.crawler
+        clone = c.clone_subtree(self.n2)
+        c.attach(clone, 'c', self.n5)
+
+        self.assertEqual(len(self.events), 1)
+        self.check_child(self.n5, clone)
+        grandchild = clone.dna_node_child
+        self.assertIs(self.dna.node(grandchild.dna_node_id), grandchild)
+
+    def test_7_attach_linked(self):
+        self.assertRaises(DNACrawlerException,
+                          self.crawler.attach, self.n2, 'a', self.n5)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,159 @@
+"""
+Test column storage of node attributes.
+"""
+
+
+import gc
+import unittest
+
+from dna import DNA
+from dna_chain import DNANode
+from dna_columns import DNAColumn, numpy
+
+
+class Person(DNANode):
+    age = DNAColumn('age')
+    pie = DNAColumn('pie')
+    height = DNAColumn('height')
+
+    def __init__(self, name, age=None):
+        super(Person, self).__init__()
+        self.name = name
+        if age is not None:
+            self.age = age
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class test_columns(unittest.TestCase):
+
+    def setUp(self):
+        self.dna = DNA(columns={'age': 'i4', 'pie': object})
+        self.crawler = self.dna.spawn_crawler()
+
+        self.people = [Person('p{}'.format(i), i * 10) for i in range(5)]
+        self.dna.head = self.people[0]
+        for prev, person in zip(self.people, self.people[1:3]):
+            self.crawler.add_after(person, prev)
+        self.crawler.add_child(self.people[3], self.people[1])
+        self.crawler.add_after(self.people[4], self.people[3])
+
+    def test_1_attribute_access(self):
+        p = self.people[2]
+        self.assertEqual(p.age, 20)
+        self.assertNotIn('age', vars(p))
+
+        p.age = 21
+        self.assertEqual(self.dna.columns.arrays['age'][p._dna_node_slot], 21)
+        self.assertIsNone(p.pie)
+
+        p.pie = 'apple'
+        self.assertEqual(p.pie, 'apple')
+        self.assertEqual(p.dna_node_attrs(),
+                         {'name': 'p2', 'age': 21, 'pie': 'apple'})
+
+    def test_2_aggregate(self):
+        self.assertEqual(sorted(self.dna.column('age')), [0, 10, 20, 30, 40])
+        self.assertEqual(list(self.dna.column('age', self.people[1])),
+                         [10, 30, 40])
+        self.assertEqual(self.dna.column('age').sum(), 100)
+
+    def test_3_remove(self):
+        self.crawler.remove(self.people[1])
+        self.assertEqual(sorted(self.dna.column('age')), [0, 20])
+
+        self.crawler.add_child(self.people[1], self.people[2])
+        self.assertEqual(sorted(self.dna.column('age')), [0, 10, 20, 30, 40])
+
+    def test_4_slot_reuse(self):
+        p = self.people[2]
+        slot = p._dna_node_slot
+        self.crawler.remove(p)
+        del p, self.people[2]
+        gc.collect()
+
+        new = Person('new', 7)
+        self.crawler.add_after(new, self.people[0])
+        self.assertEqual(new._dna_node_slot, slot)
+        self.assertEqual(sorted(self.dna.column('age')), [0, 7, 10, 30, 40])
+
+    def test_5_copy(self):
+        copy = self.people[3].dna_node_copy()
+        self.assertIsNone(copy._dna_node_columns)
+        self.assertEqual(copy.age, 30)
+
+        copy.age = 31
+        self.assertEqual(self.people[3].age, 30)
+
+    def test_6_grow(self):
+        prev = self.people[4]
+        for i in range(200):
+            person = Person('x{}'.format(i), 1)
+            self.crawler.add_after(person, prev)
+            prev = person
+
+        self.assertEqual(self.dna.column('age').sum(), 300)
+        self.assertEqual(prev.age, 1)
+
+    def test_7_head_none(self):
+        self.dna.head = None
+        self.assertEqual(len(self.dna.column('age')), 0)
+
+    def test_8_replace_head(self):
+        other = [Person('q0', 1), Person('q1', 2)]
+        self.dna.head = other[0]
+        self.crawler.add_after(other[1], other[0])
+        self.assertEqual(sorted(self.dna.column('age')), [1, 2])
+
+        # Editing at the head of the new chain keeps the old one out.
+        self.crawler.add_before(Person('q2', 3), other[0])
+        self.crawler.remove(other[0])
+        self.assertEqual(sorted(self.dna.column('age')), [2, 3])
+
+        # Going back brings the old chain's values back.
+        self.dna.head = self.people[0]
+        self.assertEqual(sorted(self.dna.column('age')), [0, 10, 20, 30, 40])
+
+    def test_9_undeclared_column(self):
+        p = Person('h')
+        p.height = 180
+        self.crawler.add_after(p, self.people[0])
+
+        self.assertEqual(p.height, 180)
+        self.assertEqual(vars(p)['height'], 180)
+        self.crawler.set_attr('height', 181, p)
+        self.assertEqual(p.height, 181)
+        self.crawler.del_attr('height', p)
+        self.assertFalse(hasattr(p, 'height'))
+
+    def test_10_set_attr_op(self):
+        events = []
+
+        class RNA(object):
+            def on_dna_event(self, event):
+                events.append(event)
+
+        self.dna.link(RNA())
+        self.crawler.set_attr('pie', 'apple', self.people[0])
+        self.assertEqual(events, [('n', '^', self.people[0], 'pie', 'apple')])
+        self.assertRaises(AttributeError, self.crawler.del_attr, 'pie',
+                          self.people[0])
+
+    def test_11_undeclared_class(self):
+        class Pet(DNANode):
+            def __init__(self, age):
+                super(Pet, self).__init__()
+                self.age = age
+
+        pet = Pet(7)
+        self.crawler.add_child(pet, self.people[2])
+        self.assertEqual(pet.age, 7)
+        self.assertEqual(pet.dna_node_attrs(), {'age': 7})
+
+        pet.age = 8
+        self.assertEqual(pet.dna_node_copy().age, 8)
+        self.assertEqual(sorted(self.dna.column('age')), [0, 10, 20, 30, 40])
+        self.assertEqual(list(self.dna.column('age', self.people[2])), [20])
+
+
+if __name__ == '__main__':
+    unittest.main()
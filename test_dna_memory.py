@@ -0,0 +1,81 @@
+"""
+Test memory introspection of DNA chains and RNAs.
+"""
+
+
+import gc
+import unittest
+
+from dna_memory import (AllocationTrace, detached_nodes, footprint,
+                        node_size, subtree_footprints, tracemalloc)
+from test_dna import build, nodes
+from test_dna_chain import TestNode
+
+
+class RNA(object):
+
+    def on_dna_event(self, event):
+        pass
+
+
+class test_memory(unittest.TestCase):
+
+    def setUp(self):
+        self.dna = build(['a', ('b', ['c', ('d', ['e'])]), 'f'])
+        self.crawler = self.dna.spawn_crawler()
+        self.n = nodes(self.dna)
+
+    def test_1_footprint(self):
+        count, size = footprint(self.dna)
+        self.assertEqual(count, 6)
+        self.assertEqual(size, sum(node_size(n) for n in self.n.values()))
+
+    def test_2_subtrees(self):
+        report = subtree_footprints(self.dna)
+        self.assertEqual([(n.name, d, c) for n, d, c, _ in report],
+                         [('a', 0, 1), ('b', 0, 4), ('f', 0, 1)])
+        self.assertEqual(sum(r[3] for r in report), footprint(self.dna)[1])
+
+        report = subtree_footprints(self.dna, 1)
+        self.assertEqual([(n.name, d, c) for n, d, c, _ in report],
+                         [('a', 0, 1), ('b', 0, 4), ('c', 1, 1), ('d', 1, 2),
+                          ('f', 0, 1)])
+
+    def test_3_detached(self):
+        self.assertEqual(detached_nodes(self.dna), [])
+
+        self.crawler.remove(self.n['b'])
+        self.crawler.remove(self.n['f'])
+        self.assertEqual(sorted(n.name for n in detached_nodes(self.dna)),
+                         ['b', 'f'])
+
+        del self.n
+        gc.collect()
+        self.assertEqual(detached_nodes(self.dna), [])
+
+    def test_4_unlinked_rnas(self):
+        rna = RNA()
+        self.dna.link(rna)
+        self.assertEqual(self.dna.unlinked_rnas(), [])
+
+        self.dna.unlink(rna)
+        self.assertEqual(self.dna.unlinked_rnas(), [rna])
+
+        del rna
+        gc.collect()
+        self.assertEqual(self.dna.unlinked_rnas(), [])
+
+    @unittest.skipIf(tracemalloc is None, "tracemalloc is not available")
+    def test_5_allocation_trace(self):
+        with AllocationTrace() as trace:
+            kept = [TestNode(i) for i in range(1000)]
+            for node in kept:
+                self.crawler.add_after(node, self.n['f'])
+
+        self.assertGreater(trace.size_diff, 0)
+        self.assertTrue(trace.top(3))
+        self.assertFalse(tracemalloc.is_tracing())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+"""
+Test replicating a DNA chain to followers.
+"""
+
+
+import time
+import unittest
+from multiprocessing import Pipe, Process, Queue
+
+from dna_replication import (DNAFollower, DNAReplicationException,
+                             DNAReplicator)
+from test_dna import build, shape
+from test_dna_chain import TestNode
+
+
+def follower_main(conn, results):
+    """
+    Run a follower until the master closes, then report the chain's shape.
+    """
+    follower = DNAFollower(conn)
+    while not follower.closed:
+        follower.receive()
+    ages = [getattr(n, 'age', None)
+            for n in follower.dna.spawn_crawler().crawl()]
+    results.put((shape(follower.dna), ages, follower.seq))
+
+
+class test_replication(unittest.TestCase):
+
+    def setUp(self):
+        self.master = build(['a', ('b', ['c', 'd']), 'e'])
+        self.replicator = DNAReplicator(self.master)
+        self.crawler = self.master.spawn_crawler()
+
+    def nodes(self):
+        return dict((n.name, n) for n in self.master.spawn_crawler().crawl())
+
+    def follow(self):
+        here, there = Pipe()
+        self.replicator.add_follower(here)
+        follower = DNAFollower(there)
+        follower.poll()
+        return follower
+
+    def edit(self):
+        n = self.nodes()
+        self.crawler.move_child(n['e'], n['c'])
+        self.crawler.add_after(TestNode('f'), n['a'])
+        self.crawler.remove(n['d'])
+        self.crawler.set_attr('age', 3, n['c'])
+
+    def test_1_snapshot(self):
+        follower = self.follow()
+        self.assertEqual(shape(follower.dna), shape(self.master))
+        self.assertEqual(follower.seq, 0)
+
+    def test_2_batches(self):
+        follower = self.follow()
+        self.edit()
+        self.replicator.flush()
+        self.assertEqual(follower.poll(), 1)
+
+        self.assertEqual(shape(follower.dna), shape(self.master))
+        self.assertEqual(follower.seq, 1)
+        self.assertEqual(follower.events, 4)
+        c = follower.node(self.nodes()['c'].dna_node_id)
+        self.assertEqual(c.age, 3)
+        self.assertEqual(self.replicator.lag(), 0)
+
+    def test_3_late_joiner(self):
+        first = self.follow()
+        self.edit()
+        second = self.follow()
+        self.assertEqual(self.replicator.lag(), 1)
+
+        first.poll()
+        self.assertEqual(first.seq, second.seq)
+        self.assertEqual(shape(first.dna), shape(second.dna))
+        self.assertEqual(self.replicator.lag(), 0)
+
+    def test_4_gap(self):
+        here, there = Pipe()
+        follower = DNAFollower(there)
+        here.send(('s', 0, time.time(), []))
+        here.send(('b', 2, time.time(), []))
+        follower.receive()
+        self.assertRaises(DNAReplicationException, follower.receive)
+
+    def test_5_dead_follower(self):
+        here, there = Pipe()
+        self.replicator.add_follower(here)
+        there.close()
+
+        events = []
+
+        class RNA(object):
+            def on_dna_event(self, event):
+                events.append(event)
+
+        self.master.link(RNA())
+        self.replicator.max_batch = 1
+        self.crawler.set_attr('age', 1, self.nodes()['a'])
+
+        self.assertEqual(self.nodes()['a'].age, 1)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(self.replicator.dropped, [here])
+        self.assertEqual(self.replicator.lag(), 0)
+        self.replicator.close()
+
+    def test_6_other_process(self):
+        here, there = Pipe()
+        results = Queue()
+        proc = Process(target=follower_main, args=(there, results))
+        proc.start()
+
+        self.replicator.add_follower(here)
+        self.edit()
+        self.replicator.flush()
+        self.crawler.set_attr('age', 4, self.nodes()['a'])
+        self.replicator.close()
+
+        follower_shape, ages, seq = results.get(timeout=10)
+        proc.join()
+
+        self.assertEqual(follower_shape, shape(self.master))
+        self.assertEqual(ages, [getattr(n, 'age', None)
+                                for n in self.master.spawn_crawler().crawl()])
+        self.assertEqual(seq, 2)
+
+    def test_7_subtree_event(self):
+        follower = self.follow()
+        events = []
+
+        class RNA(object):
+            def on_dna_event(self, event):
+                events.append(event)
+
+        follower.dna.link(RNA())
+        n = self.nodes()
+        clone = self.crawler.clone_subtree(n['b'])
+        self.crawler.attach(clone, 'a', n['e'])
+        self.replicator.flush()
+        follower.poll()
+
+        self.assertEqual(shape(follower.dna), shape(self.master))
+        root = follower.node(clone.dna_node_id)
+        self.assertEqual(events, [('c', '+', root, 'a',
+                                   follower.node(n['e'].dna_node_id))])
+        for node in (clone.dna_node_child,
+                     clone.dna_node_child.dna_node_next_sib):
+            self.assertEqual(follower.node(node.dna_node_id).name, node.name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+"""
+Test coalescing and delivering events with DNAScheduler.
+"""
+
+
+import unittest
+
+from dna_scheduler import DNAScheduler
+from test_dna import build, nodes
+from test_dna_chain import TestNode
+
+
+class RNA(object):
+
+    def __init__(self):
+        self.batches = []
+
+    def on_dna_events(self, events):
+        self.batches.append(events)
+
+
+class test_scheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.dna = build(['a', ('b', ['c']), 'd'])
+        self.crawler = self.dna.spawn_crawler()
+        self.n = nodes(self.dna)
+
+        self.now = 0.0
+        self.scheduler = DNAScheduler(self.dna, interval=0.1,
+                                      clock=lambda: self.now)
+        self.rna = RNA()
+        self.scheduler.link(self.rna)
+
+    def flush(self):
+        self.scheduler.flush()
+        return self.rna.batches.pop()
+
+    def test_1_interval(self):
+        c, n = self.crawler, self.n
+        c.set_attr('age', 1, n['a'])
+        self.scheduler.tick()
+        self.assertEqual(len(self.rna.batches), 1)
+
+        c.set_attr('age', 2, n['a'])
+        self.now = 0.05
+        self.scheduler.tick()
+        self.assertEqual(len(self.rna.batches), 1)
+
+        self.now = 0.1
+        self.scheduler.tick()
+        self.assertEqual(self.rna.batches[-1], [('n', '^', n['a'], 'age', 2)])
+
+        # Nothing to deliver.
+        self.now = 1.0
+        self.scheduler.tick()
+        self.assertEqual(len(self.rna.batches), 2)
+
+        self.scheduler.request(self.rna)
+        self.scheduler.tick()
+        self.assertEqual(self.rna.batches[-1], [])
+
+        # Like unlink, ignores RNAs that aren't linked.
+        self.scheduler.request(RNA())
+
+    def test_2_moves(self):
+        c, n = self.crawler, self.n
+        c.move_after(n['a'], n['d'])
+        c.move_child(n['a'], n['b'])
+        c.move_before(n['a'], n['c'])
+        self.assertEqual(self.flush(), [('c', '^', n['a'], 'b', n['c'])])
+
+    def test_3_add_remove(self):
+        c, n = self.crawler, self.n
+        e = TestNode('e')
+        c.add_after(e, n['d'])
+        c.move_child(e, n['a'])
+        self.assertEqual(self.flush(), [('c', '+', e, 'c', n['a'])])
+
+        f = TestNode('f')
+        c.add_after(f, n['d'])
+        c.set_attr('age', 1, f)
+        c.remove(f)
+        c.remove(n['c'])
+        c.add_child(n['c'], n['d'])
+        self.assertEqual(self.flush(), [('c', '^', n['c'], 'c', n['d'])])
+
+    def test_4_attrs(self):
+        c, n = self.crawler, self.n
+        c.set_attr('age', 1, n['a'])
+        c.set_attr('age', 2, n['a'])
+        c.set_attr('pie', 'apple', n['b'])
+        c.del_attr('pie', n['b'])
+        c.set_attr('age', 3, n['d'])
+        c.remove(n['d'])
+        self.assertEqual(self.flush(), [('n', '+', n['a'], 'age', 2),
+                                        ('c', '-', n['d'])])
+
+    def test_5_removed_subtree(self):
+        c, n = self.crawler, self.n
+        c.set_attr('age', 1, n['c'])
+        c.set_attr('age', 1, n['a'])
+        c.remove(n['b'])
+        self.assertEqual(self.flush(), [('n', '+', n['a'], 'age', 1),
+                                        ('c', '-', n['b'])])
+
+    def test_6_dirty_subtree(self):
+        c, n = self.crawler, self.n
+        e, f, g = TestNode('e'), TestNode('f'), TestNode('g')
+        c.add_after(e, n['a'])
+        c.add_child(f, e)
+        c.add_after(g, f)
+        c.set_attr('age', 1, g)
+        c.set_attr('age', 1, e)
+        self.assertEqual(self.flush(), [('c', '+', e, 'a', n['a'])])
+
+    def test_7_readded(self):
+        c, n = self.crawler, self.n
+        c.set_attr('age', 5, n['d'])
+        c.detach(n['d'])
+        c.attach(n['d'], 'c', n['a'])
+        self.assertEqual(self.flush(), [('n', '+', n['d'], 'age', 5),
+                                        ('c', '^', n['d'], 'c', n['a'])])
+
+        c.set_attr('age', 1, n['c'])
+        c.detach(n['b'])
+        c.attach(n['b'], 'a', n['d'])
+        self.assertEqual(self.flush(), [('n', '+', n['c'], 'age', 1),
+                                        ('c', '^', n['b'], 'a', n['d'])])
+
+    def test_8_removed_added_subtree(self):
+        c, n = self.crawler, self.n
+        p, ch = TestNode('p'), TestNode('ch')
+        c.add_after(p, n['d'])
+        c.add_child(ch, p)
+        c.remove(p)
+        self.assertEqual(self.flush(), [])
+
+        c.move_after(n['c'], n['d'])
+        c.move_child(n['c'], n['b'])
+        c.remove(n['b'])
+        self.assertEqual(self.flush(), [('c', '-', n['b'])])
+
+    def test_9_folded_moves(self):
+        c, n = self.crawler, self.n
+        e, f = TestNode('e'), TestNode('f')
+        c.add_after(e, n['d'])
+        c.add_child(f, n['a'])
+        c.move_child(f, e)
+        self.assertEqual(self.flush(), [('c', '+', e, 'a', n['d'])])
+
+        # Moved out of a subtree added in the same batch, so still an add.
+        g, h = TestNode('g'), TestNode('h')
+        c.add_after(g, n['d'])
+        c.add_child(h, g)
+        c.move_after(h, n['a'])
+        self.assertEqual(self.flush(), [('c', '+', g, 'a', n['d']),
+                                        ('c', '+', h, 'a', n['a'])])
+
+    def test_10_event_ids(self):
+        self.dna.event_ids = True
+        self.crawler.set_attr('age', 1, self.n['a'])
+        self.crawler.set_attr('age', 2, self.n['a'])
+        self.assertEqual(self.flush(),
+                         [('n', '+', self.n['a'].dna_node_id, 'age', 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()